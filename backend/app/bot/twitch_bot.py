@@ -1,6 +1,8 @@
 from twitchio.ext import commands
 from datetime import datetime, timezone, timedelta
+import asyncio
 import bleach
+import sys
 
 # Brasília timezone (UTC-3)
 BRT = timezone(timedelta(hours=-3))
@@ -15,17 +17,41 @@ logger = logging.getLogger(__name__)
 ALLOWED_TAGS: list[str] = []
 ALLOWED_ATTRIBUTES: dict[str, list[str]] = {}
 
+# Built once: bleach re-parses the allowed-lists on every bleach.clean() call
+_CLEANER = bleach.sanitizer.Cleaner(tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+# Display names never contain legitimate markup; dropping these characters is
+# enough to neutralize them without running an HTML parser
+_STRIP_TABLE = str.maketrans("", "", "<>&\"'`")
+
 # Bot accounts to ignore (lowercase)
 IGNORED_BOTS: set[str] = {
     "streamadsbot",
     "folhinhabot",
 }
 
+# Message insert batching
+FLUSH_BATCH_SIZE = 200  # Flush immediately once this many messages are buffered
+FLUSH_INTERVAL = 0.5  # Seconds between periodic flushes
+
+# Interned document keys: the same string objects are reused for every message,
+# which keeps BSON encoding on the identity fast path
+_K_USER_ID = sys.intern("user_id")
+_K_USERNAME = sys.intern("username")
+_K_DISPLAY_NAME = sys.intern("display_name")
+_K_MESSAGE = sys.intern("message")
+_K_CHANNEL = sys.intern("channel")
+_K_TIMESTAMP = sys.intern("timestamp")
+_K_HOUR = sys.intern("hour")
+
 
 def sanitize_message(content: str) -> str:
     """Sanitize message content to prevent XSS"""
+    # Fast path: almost no Twitch messages contain markup, skip the HTML parser
+    if "<" not in content and "&" not in content:
+        return content[:500] if len(content) > 500 else content
     # Strip all HTML tags
-    cleaned = bleach.clean(content, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+    cleaned = _CLEANER.clean(content)
     # Limit message length
     return cleaned[:500] if len(cleaned) > 500 else cleaned
 
@@ -40,10 +66,66 @@ class TwitchBot(commands.Bot):
         )
         self.target_channel = settings.twitch_channel
         self._settings = settings
+        self._http: httpx.AsyncClient | None = None
+        self._buf: list[dict] = []
+        self._flush_event = asyncio.Event()
+        self._flusher_task: asyncio.Task | None = None
+        # Memoized BRT hour: message bursts in the same second share one tz conversion
+        self._tz_cache_sec = 0
+        self._tz_cache_hour = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Lazily create a long-lived HTTP client (reuses TCP/TLS connections)"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=10.0,
+                limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+            )
+        return self._http
+
+    async def close_http(self):
+        """Close the shared HTTP client (called on shutdown)"""
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
 
     async def event_ready(self):
         logger.info(f"Bot connected as {self.nick} to #{self.target_channel}")
         print(f"Bot connected as {self.nick} to #{self.target_channel}")
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = asyncio.create_task(self._flusher())
+
+    async def _flusher(self):
+        """Drain buffered messages in batches instead of one insert per chat line"""
+        collection = db.messages_unacked
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            if not self._buf:
+                continue
+            batch, self._buf = self._buf, []
+            try:
+                await collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                logger.error(f"Error saving message batch ({len(batch)} docs): {e}")
+
+    async def flush_pending(self):
+        """Flush any buffered messages immediately (called on shutdown)"""
+        if self._flusher_task:
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+        if self._buf:
+            batch, self._buf = self._buf, []
+            try:
+                await db.messages.insert_many(batch, ordered=False)
+            except Exception as e:
+                logger.error(f"Error flushing message batch ({len(batch)} docs): {e}")
 
     async def refresh_oauth_token(self) -> bool:
         """Refresh the OAuth token using the refresh token"""
@@ -53,24 +135,24 @@ class TwitchBot(commands.Bot):
             return False
 
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    "https://id.twitch.tv/oauth2/token",
-                    data={
-                        "grant_type": "refresh_token",
-                        "refresh_token": settings.twitch_refresh_token,
-                        "client_id": settings.twitch_client_id,
-                        "client_secret": settings.twitch_client_secret,
-                    }
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    # Note: In production, you'd want to persist the new tokens
-                    logger.info("Successfully refreshed OAuth token")
-                    return True
-                else:
-                    logger.error(f"Failed to refresh token: {response.status_code}")
-                    return False
+            client = self._get_client()
+            response = await client.post(
+                "https://id.twitch.tv/oauth2/token",
+                data={
+                    "grant_type": "refresh_token",
+                    "refresh_token": settings.twitch_refresh_token,
+                    "client_id": settings.twitch_client_id,
+                    "client_secret": settings.twitch_client_secret,
+                }
+            )
+            if response.status_code == 200:
+                data = response.json()
+                # Note: In production, you'd want to persist the new tokens
+                logger.info("Successfully refreshed OAuth token")
+                return True
+            else:
+                logger.error(f"Failed to refresh token: {response.status_code}")
+                return False
         except Exception as e:
             logger.error(f"Error refreshing OAuth token: {e}")
             return False
@@ -79,36 +161,42 @@ class TwitchBot(commands.Bot):
         if message.echo:
             return
 
+        author = message.author
+        name = author.name
+        username = name.lower()
+
         # Ignore bot accounts
-        if message.author.name.lower() in IGNORED_BOTS:
+        if username in IGNORED_BOTS:
             return
 
         now = datetime.now(timezone.utc)
-        now_brt = now.astimezone(BRT)
+        sec = int(now.timestamp())
+        if sec != self._tz_cache_sec:
+            self._tz_cache_hour = now.astimezone(BRT).hour
+            self._tz_cache_sec = sec
 
         # Sanitize user inputs
         sanitized_message = sanitize_message(message.content)
-        sanitized_display_name = bleach.clean(
-            message.author.display_name or message.author.name,
-            tags=ALLOWED_TAGS,
-            attributes=ALLOWED_ATTRIBUTES,
-            strip=True
-        )[:25]  # Twitch display names max 25 chars
+        display_name = author.display_name or name
+        # Twitch display names max 25 chars
+        sanitized_display_name = display_name.translate(_STRIP_TABLE)[:25]
+
+        # Twitch user ID (permanent); twitchio may hand us an int or a str
+        user_id = author.id if isinstance(author.id, str) else str(author.id)
 
         doc = {
-            "user_id": str(message.author.id),  # Twitch user ID (permanent)
-            "username": message.author.name.lower(),
-            "display_name": sanitized_display_name,
-            "message": sanitized_message,
-            "channel": message.channel.name,
-            "timestamp": now,
-            "hour": now_brt.hour  # Store hour in Brasília timezone (UTC-3)
+            _K_USER_ID: user_id,
+            _K_USERNAME: username,
+            _K_DISPLAY_NAME: sanitized_display_name,
+            _K_MESSAGE: sanitized_message,
+            _K_CHANNEL: message.channel.name,
+            _K_TIMESTAMP: now,
+            _K_HOUR: self._tz_cache_hour  # Store hour in Brasília timezone (UTC-3)
         }
 
-        try:
-            await db.messages.insert_one(doc)
-        except Exception as e:
-            logger.error(f"Error saving message: {e}")
+        self._buf.append(doc)
+        if len(self._buf) >= FLUSH_BATCH_SIZE:
+            self._flush_event.set()
 
         await self.handle_commands(message)
 
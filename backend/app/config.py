@@ -1,8 +1,11 @@
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
-from functools import lru_cache
+from functools import cache
 import re
 
+# Compiled once at import; validator may run on every Settings construction
+_MONGO_URL_RE = re.compile(r"^mongodb(\+srv)?://")
+
 
 class Settings(BaseSettings):
     twitch_oauth_token: str = ""
@@ -25,6 +28,8 @@ class Settings(BaseSettings):
     # Security Configuration
     health_check_token: str = ""  # Optional token for health endpoint protection
     mongodb_timeout_ms: int = 5000  # MongoDB operation timeout
+    mongodb_min_pool_size: int = 20  # Connections kept warm in the pool
+    mongodb_max_pool_size: int = 200  # Upper bound for bursty chat + API load
     max_request_size: int = 1048576  # 1MB max request size
     enable_security_headers: bool = True
 
@@ -35,8 +40,7 @@ class Settings(BaseSettings):
     @classmethod
     def validate_mongodb_url(cls, v: str) -> str:
         """Validate MongoDB connection string format"""
-        pattern = r"^mongodb(\+srv)?:\/\/"
-        if not re.match(pattern, v):
+        if not _MONGO_URL_RE.match(v):
             raise ValueError("Invalid MongoDB connection string format")
         return v
 
@@ -46,6 +50,6 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
-@lru_cache
+@cache
 def get_settings() -> Settings:
     return Settings()
@@ -10,6 +10,12 @@ class DatabaseManager:
     client: AsyncIOMotorClient | None = None
     db: AsyncIOMotorDatabase | None = None
     _timeout_ms: int = 5000
+    # Collection handles cached at connect() so hot paths skip Motor's
+    # per-access Collection construction
+    _messages = None
+    _messages_unacked = None
+    _feedback = None
+    _user_hour_counts = None
 
     async def connect(self):
         settings = get_settings()
@@ -21,23 +27,60 @@ class DatabaseManager:
             serverSelectionTimeoutMS=self._timeout_ms,
             connectTimeoutMS=self._timeout_ms,
             socketTimeoutMS=self._timeout_ms,
-            maxPoolSize=50,
-            minPoolSize=5,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            waitQueueTimeoutMS=self._timeout_ms,
+            heartbeatFrequencyMS=10000,
             retryWrites=True,
         )
         self.db = self.client[settings.mongodb_db_name]
+        self._messages = self.db.chat_messages
+        self._messages_unacked = self._messages.with_options(write_concern=WriteConcern(w=0))
+        self._feedback = self.db.feedback
+        self._user_hour_counts = self.db.user_hour_counts
+        # Motor connects lazily; ping so the first real request doesn't pay the handshake
+        await self.client.admin.command("ping")
         await self._create_indexes()
         logger.info("Database connected with timeout: %dms", self._timeout_ms)
 
     async def _create_indexes(self):
-        messages = self.db.chat_messages
-        await messages.create_index([("username", 1), ("timestamp", -1)])
-        await messages.create_index([("timestamp", -1)])
-        await messages.create_index([("username", 1), ("hour", 1)])
-        # Indexes for user_id (Twitch ID) - preserves stats across username changes
-        await messages.create_index([("user_id", 1), ("timestamp", -1)])
-        await messages.create_index([("user_id", 1), ("hour", 1)])
-        logger.info("Database indexes created")
+        messages = self._messages
+        wanted = {
+            "username_1_timestamp_-1": [("username", 1), ("timestamp", -1)],
+            "timestamp_-1": [("timestamp", -1)],
+            "username_1_hour_1": [("username", 1), ("hour", 1)],
+            # Period-windowed pipelines match on timestamp then group by
+            # username; (timestamp, username) keeps them on the index instead
+            # of a collection scan + in-memory sort
+            "timestamp_-1_username_1": [("timestamp", -1), ("username", 1)],
+            "hour_1_username_1": [("hour", 1), ("username", 1)],
+            # Indexes for user_id (Twitch ID) - preserves stats across username changes
+            "user_id_1_timestamp_-1": [("user_id", 1), ("timestamp", -1)],
+            "user_id_1_hour_1": [("user_id", 1), ("hour", 1)],
+        }
+        # create_index is idempotent server-side but still costs a round-trip
+        # per call; only create what's actually missing
+        existing = await messages.index_information()
+        created = 0
+        for name, keys in wanted.items():
+            if name not in existing:
+                await messages.create_index(keys, name=name)
+                created += 1
+
+        # Rollup collection: unique (username, hour) is required by the $merge
+        # that maintains it; (hour, count) serves the hour-leaders read path
+        rollup = self._user_hour_counts
+        rollup_wanted = {
+            "username_1_hour_1": ([("username", 1), ("hour", 1)], {"unique": True}),
+            "hour_1_count_-1": ([("hour", 1), ("count", -1)], {}),
+        }
+        rollup_existing = await rollup.index_information()
+        for name, (keys, opts) in rollup_wanted.items():
+            if name not in rollup_existing:
+                await rollup.create_index(keys, name=name, **opts)
+                created += 1
+
+        logger.info("Database indexes verified (%d created)", created)
 
     async def disconnect(self):
         if self.client:
@@ -46,11 +89,19 @@ class DatabaseManager:
 
     @property
     def messages(self):
-        return self.db.chat_messages
+        return self._messages
+
+    @property
+    def messages_unacked(self):
+        return self._messages_unacked
 
     @property
     def feedback(self):
-        return self.db.feedback
+        return self._feedback
+
+    @property
+    def user_hour_counts(self):
+        return self._user_hour_counts
 
     @property
     def timeout_ms(self) -> int:
@@ -0,0 +1,7 @@
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+# Single shared rate limiter: main.py registers it on app.state and the
+# routers decorate endpoints against it, so there is one backing store for
+# all limits instead of one per module.
+limiter = Limiter(key_func=get_remote_address)
@@ -1,20 +1,21 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from starlette.middleware.base import BaseHTTPMiddleware
 import asyncio
 import logging
+from functools import cache
 from pathlib import Path
 
 from app.config import get_settings
 from app.database import db
 from app.bot.twitch_bot import TwitchBot
+from app.limiter import limiter
 from app.routers.stats import router as stats_router
+from app.services.stats_service import close_http_client, user_hour_rollup_refresher
 
 # Configure logging
 logging.basicConfig(
@@ -23,67 +24,128 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Rate limiter
-limiter = Limiter(key_func=get_remote_address)
+@cache
+def get_cors_origins() -> tuple[str, ...]:
+    """Parse the configured CORS origins once"""
+    settings = get_settings()
+    if settings.cors_origins == "*":
+        return ("*",)
+    return tuple(origin.strip() for origin in settings.cors_origins.split(","))
+
+
+@cache
+def get_frontend_path() -> Path:
+    return Path(__file__).parent.parent.parent / "frontend"
+
+
+class SecurityHeadersMiddleware:
+    """Add security headers to all responses.
+
+    Implemented as pure ASGI middleware: BaseHTTPMiddleware spawns an extra
+    task and memory-stream pair per request, which is avoidable overhead for
+    something that only appends response headers.
+    """
+
+    _STATIC_HEADERS = (
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+        (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+    )
+    # CSP for API responses
+    _CSP_HEADER = (b"content-security-policy", b"default-src 'none'; frame-ancestors 'none'")
+    _API_PREFIX = "/api/"
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        is_api = scope["path"].startswith(self._API_PREFIX)
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses"""
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        # CSP for API responses
-        if request.url.path.startswith("/api/"):
-            response.headers["Content-Security-Policy"] = "default-src 'none'; frame-ancestors 'none'"
-        return response
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = message.setdefault("headers", [])
+                headers.extend(self._STATIC_HEADERS)
+                if is_api:
+                    headers.append(self._CSP_HEADER)
+            await send(message)
 
+        await self.app(scope, receive, send_wrapper)
 
-class RequestSizeLimitMiddleware(BaseHTTPMiddleware):
+
+class RequestSizeLimitMiddleware:
     """Limit request body size to prevent large payload attacks"""
-    def __init__(self, app, max_size: int = 1048576):
-        super().__init__(app)
-        self.max_size = max_size
 
-    async def dispatch(self, request: Request, call_next):
-        if request.headers.get("content-length"):
-            content_length = int(request.headers["content-length"])
-            if content_length > self.max_size:
-                logger.warning(f"Request too large: {content_length} bytes from {request.client.host}")
-                return JSONResponse(
-                    status_code=413,
-                    content={"detail": "Request entity too large"}
-                )
-        return await call_next(request)
+    # Encoded once; rejection needs no per-request JSON encoding
+    _REJECT_BODY = b'{"detail":"Request entity too large"}'
+    _REJECT_HEADERS = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(_REJECT_BODY)).encode()),
+    ]
 
+    def __init__(self, app, max_size: int = 1048576):
+        self.app = app
+        self.max_size = max_size
 
-class SecurityLoggingMiddleware(BaseHTTPMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        content_length = int(value)
+                    except ValueError:
+                        break
+                    if content_length > self.max_size:
+                        client = scope.get("client")
+                        host = client[0] if client else "unknown"
+                        logger.warning(f"Request too large: {content_length} bytes from {host}")
+                        await self._reject(send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+    async def _reject(self, send):
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": list(self._REJECT_HEADERS),
+        })
+        await send({"type": "http.response.body", "body": self._REJECT_BODY})
+
+
+class SecurityLoggingMiddleware:
     """Log security-relevant events"""
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
 
-        # Log rate limit violations
-        if response.status_code == 429:
-            logger.warning(
-                f"Rate limit exceeded: {request.client.host} - {request.method} {request.url.path}"
-            )
+    _LOG_REASONS = {
+        429: "Rate limit exceeded",  # Rate limit violations
+        422: "Validation error",  # Potential attacks
+        401: "Unauthorized access",
+        403: "Unauthorized access",
+    }
 
-        # Log validation errors (potential attacks)
-        if response.status_code == 422:
-            logger.warning(
-                f"Validation error: {request.client.host} - {request.method} {request.url.path}"
-            )
+    def __init__(self, app):
+        self.app = app
 
-        # Log unauthorized access attempts
-        if response.status_code in (401, 403):
-            logger.warning(
-                f"Unauthorized access: {request.client.host} - {request.method} {request.url.path}"
-            )
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        return response
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                reason = self._LOG_REASONS.get(message["status"])
+                if reason:
+                    client = scope.get("client")
+                    host = client[0] if client else "unknown"
+                    logger.warning(f"{reason}: {host} - {scope['method']} {scope['path']}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
 
 
 @asynccontextmanager
@@ -91,6 +153,8 @@ async def lifespan(app: FastAPI):
     await db.connect()
     print("Database connected")
 
+    rollup_task = asyncio.create_task(user_hour_rollup_refresher())
+
     settings = get_settings()
     bot = None
     bot_task = None
@@ -123,6 +187,17 @@ async def lifespan(app: FastAPI):
         except asyncio.CancelledError:
             pass
 
+    rollup_task.cancel()
+    try:
+        await rollup_task
+    except asyncio.CancelledError:
+        pass
+
+    if bot:
+        await bot.flush_pending()
+        await bot.close_http()
+
+    await close_http_client()
     await db.disconnect()
     print("Shutdown complete")
 
@@ -133,6 +208,7 @@ app = FastAPI(
     description="Twitch chat statistics for omeiaum channel",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     root_path=settings.api_root_path,
     docs_url="/api/docs" if settings.api_root_path == "" else None,
     redoc_url="/api/redoc" if settings.api_root_path == "" else None,
@@ -153,21 +229,22 @@ app.add_middleware(RequestSizeLimitMiddleware, max_size=settings.max_request_siz
 if settings.enable_security_headers:
     app.add_middleware(SecurityHeadersMiddleware)
 
-# CORS middleware
-cors_origins = settings.cors_origins.split(",") if settings.cors_origins != "*" else ["*"]
+# CORS middleware. Browsers silently drop credentials for wildcard origins,
+# so only claim credential support when explicit origins are configured.
+_cors_origins = get_cors_origins()
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins,
-    allow_credentials=True,
+    allow_origins=list(_cors_origins),
+    allow_credentials=_cors_origins != ("*",),
     allow_methods=["GET"],
-    allow_headers=["*"],
+    allow_headers=["content-type"],
 )
 
 app.include_router(stats_router)
 
 logger.info("Application started with security features enabled")
 
-frontend_path = Path(__file__).parent.parent.parent / "frontend"
+frontend_path = get_frontend_path()
 if frontend_path.exists():
     app.mount("/static", StaticFiles(directory=str(frontend_path)), name="static")
 
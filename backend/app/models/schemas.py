@@ -1,9 +1,15 @@
-from pydantic import BaseModel, Field, field_serializer
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
 from datetime import datetime, timezone
 from typing import Literal
 
 
-class RecentMessage(BaseModel):
+class FrozenModel(BaseModel):
+    """Base for response models: frozen/known-field models let pydantic-core
+    specialize its generated serializer"""
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+
+class RecentMessage(FrozenModel):
     message: str
     timestamp: datetime
 
@@ -14,7 +20,7 @@ class RecentMessage(BaseModel):
         return value.isoformat()
 
 
-class UserStats(BaseModel):
+class UserStats(FrozenModel):
     username: str
     display_name: str
     period: str
@@ -45,42 +51,42 @@ class FeedbackRequest(BaseModel):
     message: str = Field(..., min_length=10, max_length=2000)
 
 
-class FeedbackResponse(BaseModel):
+class FeedbackResponse(FrozenModel):
     success: bool
     id: str
 
 
-class HourlyActivity(BaseModel):
+class HourlyActivity(FrozenModel):
     hour: int
     count: int
 
 
-class RivalInfo(BaseModel):
+class RivalInfo(FrozenModel):
     username: str
     display_name: str
     similarity_score: float  # 0-100%
 
 
-class ReplyTarget(BaseModel):
+class ReplyTarget(FrozenModel):
     username: str
     display_name: str
     reply_count: int
 
 
-class ActiveChatter(BaseModel):
+class ActiveChatter(FrozenModel):
     username: str
     display_name: str
     message_count: int
     rank: int | None = None  # Overall leaderboard position
 
 
-class UserSearchResult(BaseModel):
+class UserSearchResult(FrozenModel):
     username: str
     display_name: str
     total_messages: int
 
 
-class UserRankings(BaseModel):
+class UserRankings(FrozenModel):
     top_rank: int | None = None  # Position in top chatters
     top_rank_change: int | None = None  # +/- vs last week (positive = improved)
     rising_rank: int | None = None  # Position in rising stars
@@ -88,19 +94,19 @@ class UserRankings(BaseModel):
     hours_dominated: list[int] = []  # Hours where user is #1
 
 
-class FavoriteHour(BaseModel):
+class FavoriteHour(FrozenModel):
     hour: int
     count: int
     percentage: float
 
 
-class EmoteUsage(BaseModel):
+class EmoteUsage(FrozenModel):
     emote_name: str
     emote_id: str
     count: int
 
 
-class RisingStarEntry(BaseModel):
+class RisingStarEntry(FrozenModel):
     rank: int
     username: str
     display_name: str
@@ -109,14 +115,14 @@ class RisingStarEntry(BaseModel):
     growth_percent: float
 
 
-class HourLeaderEntry(BaseModel):
+class HourLeaderEntry(FrozenModel):
     hour: int
     username: str
     display_name: str
     message_count: int
 
 
-class WriterEntry(BaseModel):
+class WriterEntry(FrozenModel):
     rank: int
     username: str
     display_name: str
@@ -124,75 +130,81 @@ class WriterEntry(BaseModel):
     message_count: int
 
 
-class RisingStarsResponse(BaseModel):
+class RisingStarsResponse(FrozenModel):
     entries: list[RisingStarEntry]
 
 
-class HourLeadersResponse(BaseModel):
+class HourLeadersResponse(FrozenModel):
     entries: list[HourLeaderEntry]
 
 
-class WritersResponse(BaseModel):
+class WritersResponse(FrozenModel):
     entries: list[WriterEntry]
 
 
-class ActiveChattersResponse(BaseModel):
+class ActiveChattersResponse(FrozenModel):
     count: int
     chatters: list[ActiveChatter]
     total_users: int  # Total users in leaderboard for percentage calculations
 
 
-class ChatActivityPoint(BaseModel):
+class ChatActivityPoint(FrozenModel):
     hour: int
     count: int
 
 
-class ChatActivityResponse(BaseModel):
+class ChatActivityResponse(FrozenModel):
     activity: list[ChatActivityPoint]
     total_today: int
     peak_hour: int
     peak_count: int
 
 
-class OverallActivityResponse(BaseModel):
+class OverallActivityResponse(FrozenModel):
     activity: list[ChatActivityPoint]
     total_messages: int
     peak_hour: int
     peak_count: int
 
 
-class UniqueChattersResponse(BaseModel):
+class UniqueChattersResponse(FrozenModel):
     activity: list[ChatActivityPoint]
     total_unique: int
     peak_hour: int
     peak_count: int
 
 
-class TopEmotesResponse(BaseModel):
+class TopEmotesResponse(FrozenModel):
     emotes: list[EmoteUsage]
     total_emote_uses: int
 
 
-class UserComparisonResponse(BaseModel):
+class UserComparisonResponse(FrozenModel):
     user1: UserStats
     user2: UserStats
 
 
-class LeaderboardEntry(BaseModel):
+class LeaderboardEntry(FrozenModel):
     rank: int
     username: str
     display_name: str
     message_count: int
 
 
-class LeaderboardResponse(BaseModel):
+class LeaderboardResponse(FrozenModel):
     period: str
     total_users: int
     total_messages: int
     leaderboard: list[LeaderboardEntry]
 
 
-class HealthResponse(BaseModel):
+class HealthResponse(FrozenModel):
     status: str
     bot_connected: bool
     database_connected: bool
+
+
+# Force pydantic-core schema realization at import time (UserStats carries
+# forward refs) so the first request doesn't pay the rebuild cost.
+UserStats.model_rebuild()
+UserComparisonResponse.model_rebuild()
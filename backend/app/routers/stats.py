@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, Query, Request, Path, Header, Response
-from slowapi import Limiter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Path, Header, Response
 from slowapi.util import get_remote_address
 from typing import Annotated
+import re
+import time
 from app.models.schemas import (
     UserStats, LeaderboardResponse, HealthResponse,
     RisingStarsResponse, HourLeadersResponse, WritersResponse,
@@ -17,30 +18,67 @@ from app.services.stats_service import (
     get_unique_chatters_by_hour
 )
 from app.database import db
-from app.config import get_settings
+from app.config import Settings, get_settings
+from app.limiter import limiter
 
 router = APIRouter(prefix="/api/v1", tags=["stats"])
-limiter = Limiter(key_func=get_remote_address)
 
 # Twitch username: 4-25 chars, alphanumeric and underscore, cannot start with underscore
 TWITCH_USERNAME_PATTERN = r"^[a-zA-Z0-9][a-zA-Z0-9_]{3,24}$"
+TWITCH_USERNAME_RE = re.compile(TWITCH_USERNAME_PATTERN)
+PERIOD_RE = re.compile(r"^(day|week|month|all)$")
 
 # API Version
 API_VERSION = "1.0.0"
+_API_VERSION_HEADERS = (
+    ("X-API-Version", API_VERSION),
+    ("X-API-Deprecation", "false"),
+)
+
+# Cached (monotonic timestamp, db_connected) health probe; liveness monitors
+# hit this endpoint often enough that per-request pings add up. A slightly
+# stale read is harmless, so no locking.
+_HEALTH_CACHE: tuple[float, bool] = (0.0, False)
+_HEALTH_TTL = 2.0
+
+
+def _validate_username(value: str) -> str:
+    """Validate against the precompiled username pattern"""
+    if not TWITCH_USERNAME_RE.match(value):
+        raise HTTPException(status_code=422, detail="Invalid Twitch username")
+    return value
+
+
+def valid_username(username: str = Path(...)) -> str:
+    return _validate_username(username)
+
+
+def valid_user1(user1: str = Path(...)) -> str:
+    return _validate_username(user1)
+
+
+def valid_user2(user2: str = Path(...)) -> str:
+    return _validate_username(user2)
+
+
+def valid_period(period: str = Query("all")) -> str:
+    if not PERIOD_RE.match(period):
+        raise HTTPException(status_code=422, detail="Invalid period")
+    return period
 
 
 def add_api_version_headers(response: Response) -> None:
     """Add API versioning headers to response"""
-    response.headers["X-API-Version"] = API_VERSION
-    response.headers["X-API-Deprecation"] = "false"
+    for name, value in _API_VERSION_HEADERS:
+        response.headers[name] = value
 
 
 @router.get("/stats/user/{username}", response_model=UserStats)
 @limiter.limit("30/minute")
 async def user_stats(
     request: Request,
-    username: str = Path(..., pattern=TWITCH_USERNAME_PATTERN),
-    period: str = Query("all", pattern="^(day|week|month|all)$")
+    username: Annotated[str, Depends(valid_username)],
+    period: Annotated[str, Depends(valid_period)],
 ):
     stats = await get_user_stats(username, period)
     if not stats:
@@ -52,7 +90,7 @@ async def user_stats(
 @limiter.limit("60/minute")
 async def leaderboard(
     request: Request,
-    period: str = Query("all", pattern="^(day|week|month|all)$"),
+    period: Annotated[str, Depends(valid_period)],
     limit: int = Query(10, ge=1, le=100)
 ):
     return await get_leaderboard(period, limit)
@@ -63,13 +101,13 @@ async def leaderboard(
 async def health_check(
     request: Request,
     response: Response,
+    settings: Annotated[Settings, Depends(get_settings)],
     x_health_token: Annotated[str | None, Header()] = None
 ):
     """
     Health check endpoint. Optionally protected by HEALTH_CHECK_TOKEN env var.
     If token is set, requires X-Health-Token header to access detailed info.
     """
-    settings = get_settings()
     add_api_version_headers(response)
 
     # Determine real bot status from the bot task
@@ -89,11 +127,16 @@ async def health_check(
                 database_connected=True
             )
 
-    try:
-        await db.client.admin.command("ping")
-        db_connected = True
-    except Exception:
-        db_connected = False
+    global _HEALTH_CACHE
+    now = time.monotonic()
+    cached_at, db_connected = _HEALTH_CACHE
+    if now - cached_at >= _HEALTH_TTL:
+        try:
+            await db.client.admin.command("ping")
+            db_connected = True
+        except Exception:
+            db_connected = False
+        _HEALTH_CACHE = (now, db_connected)
 
     all_healthy = db_connected and bot_connected
     return HealthResponse(
@@ -193,9 +236,9 @@ async def top_emotes(request: Request):
 @limiter.limit("20/minute")
 async def compare_users(
     request: Request,
-    user1: str = Path(..., pattern=TWITCH_USERNAME_PATTERN),
-    user2: str = Path(..., pattern=TWITCH_USERNAME_PATTERN),
-    period: str = Query("all", pattern="^(day|week|month|all)$")
+    user1: Annotated[str, Depends(valid_user1)],
+    user2: Annotated[str, Depends(valid_user2)],
+    period: Annotated[str, Depends(valid_period)],
 ):
     """Side-by-side comparison between two users"""
     stats1, stats2 = await get_user_comparison(user1, user2, period)
@@ -1,6 +1,11 @@
+from collections import Counter, deque
 from datetime import datetime, timedelta, timezone
-import math
+from functools import wraps
+import asyncio
+import heapq
 import re
+import time
+import numpy as np
 from app.database import db
 from app.config import get_settings
 import httpx
@@ -13,10 +18,36 @@ from app.models.schemas import (
 # Cache for 7TV emotes
 _7tv_emotes_cache: dict[str, str] | None = None
 _7tv_cache_time: datetime | None = None
+_7tv_refresh_task: asyncio.Task | None = None
+
+# Past the TTL, serve the stale cache and refresh in the background; only
+# block the request path when the cache is cold or older than the max age
+SEVENTV_CACHE_TTL = 3600
+SEVENTV_CACHE_MAX_AGE = 86400
 
 # HTTP client timeout (seconds)
 HTTP_TIMEOUT = 10.0
 
+# Shared HTTP client for 7TV requests (reuses TCP/TLS connections across cache refreshes)
+_http_client: httpx.AsyncClient | None = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client (called on shutdown)"""
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+
 # Database query limits
 MAX_USERS_QUERY = 1000
 MAX_MESSAGES_QUERY = 10000
@@ -31,6 +62,79 @@ IGNORED_BOTS: set[str] = {
 BOT_FILTER = {"username": {"$nin": list(IGNORED_BOTS)}}
 
 
+# Per-user per-hour rollup: maintained by the background refresher below so
+# the all-time group-by-(username, hour) endpoints read thousands of rollup
+# docs instead of re-scanning every message. Readers fall back to the raw
+# collection until the first refresh completes.
+_rollup_ready = False
+ROLLUP_REFRESH_INTERVAL = 3600
+
+
+async def refresh_user_hour_rollup():
+    """Rebuild the user_hour_counts rollup collection via $merge"""
+    global _rollup_ready
+
+    pipeline = [
+        {"$match": BOT_FILTER},
+        {"$group": {
+            "_id": {"username": "$username", "hour": "$hour"},
+            "display_name": {"$last": "$display_name"},
+            "count": {"$sum": 1}
+        }},
+        {"$project": {
+            "_id": 0,
+            "username": "$_id.username",
+            "hour": "$_id.hour",
+            "display_name": 1,
+            "count": 1
+        }},
+        {"$merge": {
+            "into": "user_hour_counts",
+            "on": ["username", "hour"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+    # $merge pipelines return no documents; to_list just drives the cursor
+    await db.messages.aggregate(pipeline).to_list(None)
+    _rollup_ready = True
+
+
+async def user_hour_rollup_refresher():
+    """Background loop keeping the rollup collection fresh"""
+    while True:
+        try:
+            await refresh_user_hour_rollup()
+        except Exception as e:
+            print(f"User-hour rollup refresh failed: {e}")
+        await asyncio.sleep(ROLLUP_REFRESH_INTERVAL)
+
+
+def ttl_cache(ttl: float):
+    """In-memory TTL memoization for async functions, keyed on arguments.
+
+    The leaderboard-style aggregations change slowly relative to how often
+    the endpoints are polled; a short TTL keeps full-collection scans off the
+    hot path while staying fresh enough for the dashboard.
+    """
+    def decorator(fn):
+        cache: dict = {}
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = args + tuple(sorted(kwargs.items()))
+            now = time.monotonic()
+            hit = cache.get(key)
+            if hit is not None and now < hit[1]:
+                return hit[0]
+            value = await fn(*args, **kwargs)
+            cache[key] = (value, now + ttl)
+            return value
+
+        return wrapper
+    return decorator
+
+
 def get_query_timeout() -> int:
     """Get MongoDB query timeout from settings"""
     settings = get_settings()
@@ -58,62 +162,99 @@ async def find_with_timeout(collection, query, sort=None, limit=None):
 
 
 async def get_7tv_emotes() -> dict[str, str]:
-    """Get 7TV emotes (name -> id), cached for 1 hour"""
-    global _7tv_emotes_cache, _7tv_cache_time
+    """Get 7TV emotes (name -> id), cached for 1 hour with stale-while-revalidate"""
+    global _7tv_refresh_task
 
     now = datetime.now(timezone.utc)
     if _7tv_emotes_cache is not None and _7tv_cache_time is not None:
-        if (now - _7tv_cache_time).total_seconds() < 3600:
+        age = (now - _7tv_cache_time).total_seconds()
+        if age < SEVENTV_CACHE_TTL:
             return _7tv_emotes_cache
+        if _7tv_emotes_cache and age < SEVENTV_CACHE_MAX_AGE:
+            # Serve stale immediately; refresh off the request path
+            if _7tv_refresh_task is None or _7tv_refresh_task.done():
+                _7tv_refresh_task = asyncio.create_task(_refresh_7tv())
+            return _7tv_emotes_cache
+
+    # Cold (or hard-expired) cache: pay the fetch synchronously
+    await _refresh_7tv()
+    return _7tv_emotes_cache or {}
 
+
+async def _refresh_7tv():
+    """Fetch 7TV emotes and swap the cache in place"""
+    global _7tv_emotes_cache, _7tv_cache_time
+
+    emotes = await _fetch_7tv_emotes()
+    if emotes or _7tv_emotes_cache is None:
+        _7tv_emotes_cache = emotes
+    # Stamp even failed refreshes so retries stay bounded to once per TTL
+    _7tv_cache_time = datetime.now(timezone.utc)
+
+
+async def _fetch_7tv_emotes() -> dict[str, str]:
+    """Fetch channel + global 7TV emotes (name -> id)"""
     settings = get_settings()
     emotes = {}
     try:
-        async with httpx.AsyncClient(timeout=HTTP_TIMEOUT) as client:
-            # Fetch channel emotes
-            resp = await client.get(f"https://7tv.io/v3/emote-sets/{settings.seventv_emote_set_id}")
-            if resp.status_code == 200:
-                data = resp.json()
-                for emote in data.get("emotes", []):
-                    emotes[emote["name"]] = emote["id"]
-
-            # Fetch global emotes
-            global_resp = await client.get("https://7tv.io/v3/emote-sets/global")
-            if global_resp.status_code == 200:
-                global_data = global_resp.json()
-                for emote in global_data.get("emotes", []):
-                    emotes[emote["name"]] = emote["id"]
+        client = _get_http_client()
+        # Fetch channel and global emotes concurrently
+        resp, global_resp = await asyncio.gather(
+            client.get(f"https://7tv.io/v3/emote-sets/{settings.seventv_emote_set_id}"),
+            client.get("https://7tv.io/v3/emote-sets/global"),
+        )
+        if resp.status_code == 200:
+            data = resp.json()
+            for emote in data.get("emotes", []):
+                emotes[emote["name"]] = emote["id"]
+
+        if global_resp.status_code == 200:
+            global_data = global_resp.json()
+            for emote in global_data.get("emotes", []):
+                emotes[emote["name"]] = emote["id"]
 
     except httpx.TimeoutException:
         print("Timeout fetching 7TV emotes")
     except Exception as e:
         print(f"Error fetching 7TV emotes: {e}")
 
-    _7tv_emotes_cache = emotes
-    _7tv_cache_time = now
     return emotes
 
 
+# Compiled emote alternation, rebuilt whenever the 7TV cache refreshes
+_emote_pattern: re.Pattern | None = None
+_emote_pattern_time: datetime | None = None
+
+
+def _get_emote_pattern(emotes: dict[str, str]) -> re.Pattern:
+    global _emote_pattern, _emote_pattern_time
+    if _emote_pattern is None or _emote_pattern_time != _7tv_cache_time:
+        # Longest-first so names that prefix each other match correctly; the
+        # lookarounds reproduce str.split() whole-token boundaries
+        names = sorted(emotes, key=len, reverse=True)
+        _emote_pattern = re.compile(
+            r"(?<!\S)(?:" + "|".join(map(re.escape, names)) + r")(?!\S)"
+        )
+        _emote_pattern_time = _7tv_cache_time
+    return _emote_pattern
+
+
 async def count_emotes_in_messages(messages: list[str], limit: int = 5) -> list[EmoteUsage]:
     """Count emote usage in a list of messages"""
     emotes = await get_7tv_emotes()
     if not emotes:
         return []
 
-    counts: dict[str, int] = {}
+    # One linear scan over the whole corpus instead of a dict lookup per word
+    pattern = _get_emote_pattern(emotes)
+    counts = Counter(pattern.findall("\n".join(messages)))
 
-    for message in messages:
-        words = message.split()
-        for word in words:
-            if word in emotes:
-                counts[word] = counts.get(word, 0) + 1
-
-    # Sort by count and take top N
-    sorted_emotes = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+    # Partial selection: top N without sorting the whole counts dict
+    top_emotes = heapq.nlargest(limit, counts.items(), key=lambda x: x[1])
 
     return [
         EmoteUsage(emote_name=name, emote_id=emotes[name], count=count)
-        for name, count in sorted_emotes
+        for name, count in top_emotes
     ]
 
 
@@ -157,11 +298,58 @@ def get_user_query(username: str, user_id: str | None) -> dict:
         return {"username": username.lower()}
 
 
+async def get_top_user_counts(period: str) -> list[dict]:
+    """Per-user message counts, sorted descending (top MAX_USERS_QUERY users).
+
+    Several stats need this same aggregation; callers inside one request
+    should fetch it once and pass it down.
+    """
+    date_filter = get_date_filter(period)
+    match_stage = {**BOT_FILTER, **date_filter} if date_filter else BOT_FILTER
+
+    pipeline = [
+        {"$match": match_stage},
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": MAX_USERS_QUERY}
+    ]
+    return await db.messages.aggregate(pipeline).to_list(MAX_USERS_QUERY)
+
+
+def _series_from_counts(counts: np.ndarray, model=ChatActivityPoint) -> tuple[list, int, int, int]:
+    """Turn a 24-slot count array into (activity, total, peak_hour, peak_count).
+
+    The counts come from our own $group stages, so model_construct skips the
+    per-field validation pass.
+    """
+    activity = [
+        model.model_construct(hour=h, count=c)
+        for h, c in enumerate(counts.tolist())
+    ]
+    peak_hour = int(counts.argmax())
+    return activity, int(counts.sum()), peak_hour, int(counts[peak_hour])
+
+
+async def _build_hourly(cursor, model=ChatActivityPoint) -> tuple[list, int, int, int]:
+    """Stream {_id: hour, count} aggregation rows straight into the count
+    array — no intermediate list between Motor and NumPy."""
+    counts = np.zeros(24, dtype=np.int64)
+    async for r in cursor:
+        counts[r["_id"]] = r["count"]
+    return _series_from_counts(counts, model)
+
+
 async def get_user_stats(username: str, period: str = "all") -> UserStats | None:
     # Don't return stats for ignored bots
     if username.lower() in IGNORED_BOTS:
         return None
 
+    # Cheap existence probe before the heavy fan-out: lookups for unknown
+    # usernames are common while the UI autocompletes, and this is a single
+    # index hit (resolve_user_id also keys on username, so nothing is lost)
+    if not await db.messages.find_one({"username": username.lower()}, projection={"_id": 1}):
+        return None
+
     # Resolve user_id to track across username changes
     user_id = await resolve_user_id(username)
     user_query = get_user_query(username, user_id)
@@ -204,39 +392,42 @@ async def get_user_stats(username: str, period: str = "all") -> UserStats | None
     if total == 0:
         return None
 
-    hourly_map = {h["_id"]: h["count"] for h in result["hourly"]}
-    hourly_activity = [
-        HourlyActivity(hour=h, count=hourly_map.get(h, 0))
-        for h in range(24)
-    ]
-
-    recent_docs = await db.messages.find(
-        user_query
-    ).sort("timestamp", -1).limit(10).to_list(10)
+    hour_counts = np.zeros(24, dtype=np.int64)
+    for r in result["hourly"]:
+        hour_counts[r["_id"]] = r["count"]
+    hourly_activity, _, fav_hour, fav_count = _series_from_counts(hour_counts, HourlyActivity)
+
+    # The percentile, rival and rankings queries all need the same
+    # top-users-by-count aggregation; run it once and share the result
+    top_users = await get_top_user_counts(period)
+
+    # Independent queries (pass user_id for consistent lookups); run them
+    # concurrently so the endpoint waits for the slowest one, not the sum
+    recent_docs, percentile, rival, top_replies, rankings, top_emotes = await asyncio.gather(
+        db.messages.find(user_query, projection={"_id": 0, "message": 1, "timestamp": 1})
+        .sort("timestamp", -1).limit(10).to_list(10),
+        get_user_percentile(username, period, user_id, top_users=top_users),
+        get_rival(username, hourly_activity, period, user_id, top_users=top_users),
+        get_top_replies(username, period, limit=5, user_id=user_id),
+        get_user_rankings(username, period, user_id, top_users=top_users),
+        get_user_top_emotes(username, limit=10, user_id=user_id),
+    )
 
     recent_messages = [
         RecentMessage(message=doc["message"], timestamp=doc["timestamp"])
         for doc in recent_docs
     ]
 
-    # Calculate new fields (pass user_id for consistent lookups)
-    percentile = await get_user_percentile(username, period, user_id)
     peak_hours = get_peak_hours(hourly_activity)
-    rival = await get_rival(username, hourly_activity, period, user_id)
-    top_replies = await get_top_replies(username, period, limit=5, user_id=user_id)
-    rankings = await get_user_rankings(username, period, user_id)
-    top_emotes = await get_user_top_emotes(username, limit=10, user_id=user_id)
 
-    # Calculate favorite hour
+    # Favorite hour falls out of the peak already computed by _build_hourly
     favorite_hour = None
-    if total > 0:
-        max_hour = max(hourly_activity, key=lambda h: h.count)
-        if max_hour.count > 0:
-            favorite_hour = FavoriteHour(
-                hour=max_hour.hour,
-                count=max_hour.count,
-                percentage=round((max_hour.count / total) * 100, 1)
-            )
+    if fav_count > 0:
+        favorite_hour = FavoriteHour(
+            hour=fav_hour,
+            count=fav_count,
+            percentage=round((fav_count / total) * 100, 1)
+        )
 
     return UserStats(
         username=username.lower(),
@@ -274,10 +465,12 @@ async def get_leaderboard(period: str = "all", limit: int = 10) -> LeaderboardRe
 
     results = await db.messages.aggregate(pipeline).to_list(limit)
 
+    # Two bounded $group passes; a single group with $addToSet materializes
+    # every distinct username in one stage and can blow the 100MB limit
     count_pipeline = [
         {"$match": match_stage},
-        {"$group": {"_id": None, "total_messages": {"$sum": 1}, "users": {"$addToSet": "$username"}}},
-        {"$project": {"total_messages": 1, "total_users": {"$size": "$users"}}}
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$group": {"_id": None, "total_users": {"$sum": 1}, "total_messages": {"$sum": "$count"}}}
     ]
     totals = await db.messages.aggregate(count_pipeline).to_list(1)
     total_info = totals[0] if totals else {"total_messages": 0, "total_users": 0}
@@ -300,23 +493,10 @@ async def get_leaderboard(period: str = "all", limit: int = 10) -> LeaderboardRe
     )
 
 
-async def get_user_percentile(username: str, period: str, user_id: str | None = None) -> float:
+async def get_user_percentile(username: str, period: str, user_id: str | None = None,
+                              top_users: list[dict] | None = None) -> float:
     """Calculate what % of users this user has more messages than"""
     date_filter = get_date_filter(period)
-    match_stage = {**BOT_FILTER, **date_filter} if date_filter else BOT_FILTER
-
-    # Get all users' message counts (limited for performance)
-    # Group by user_id when available, fall back to username
-    pipeline = [
-        {"$match": match_stage},
-        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": MAX_USERS_QUERY}
-    ]
-    all_users = await db.messages.aggregate(pipeline).to_list(MAX_USERS_QUERY)
-
-    if not all_users:
-        return 0.0
 
     # Find this user's count (use user_query if user_id available)
     user_query = get_user_query(username, user_id)
@@ -328,106 +508,147 @@ async def get_user_percentile(username: str, period: str, user_id: str | None =
     else:
         user_match = user_query
 
-    user_count_result = await db.messages.count_documents(user_match)
-    user_count = user_count_result if user_count_result else 0
-
+    user_count = await db.messages.count_documents(user_match)
     if user_count == 0:
         return 0.0
 
-    # Count users with fewer messages
-    below_count = sum(1 for user in all_users if user["count"] < user_count)
-    total_users = len(all_users)
+    if top_users is not None:
+        # Caller already ran the shared ranking aggregation; no extra query
+        below_count = sum(1 for user in top_users if user["count"] < user_count)
+        total_users = len(top_users)
+        return (below_count / total_users) * 100 if total_users > 0 else 0.0
+
+    # Standalone path: have the server return two integers instead of
+    # shipping up to MAX_USERS_QUERY per-user counts to Python
+    match_stage = {**BOT_FILTER, **date_filter} if date_filter else BOT_FILTER
+    pipeline = [
+        {"$match": match_stage},
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$facet": {
+            "below": [{"$match": {"count": {"$lt": user_count}}}, {"$count": "c"}],
+            "total": [{"$count": "c"}]
+        }}
+    ]
+    results = await db.messages.aggregate(pipeline).to_list(1)
+    if not results:
+        return 0.0
+
+    below_count = results[0]["below"][0]["c"] if results[0]["below"] else 0
+    total_users = results[0]["total"][0]["c"] if results[0]["total"] else 0
 
     return (below_count / total_users) * 100 if total_users > 0 else 0.0
 
 
+PEAK_WINDOW = 3  # Consecutive hours considered a "peak"
+
+# All wrap-around window indices, built once: row s holds (s, s+1, s+2) mod 24
+_PEAK_WINDOW_IDX = (np.arange(24)[:, None] + np.arange(PEAK_WINDOW)) % 24
+
+
 def get_peak_hours(hourly_activity: list[HourlyActivity]) -> list[int]:
     """Find top 3 consecutive hours with most activity"""
     if not hourly_activity:
         return []
 
-    counts = [h.count for h in hourly_activity]
+    counts = np.fromiter((h.count for h in hourly_activity), dtype=np.int64, count=24)
 
-    # Find the best window of 3 consecutive hours
-    best_sum = 0
-    best_start = 0
+    # Sum every wrap-around window in one vectorized pass
+    window_sums = counts[_PEAK_WINDOW_IDX].sum(axis=1)
+    best_start = int(window_sums.argmax())
 
-    for start in range(24):
-        # Handle wrap-around (23, 0, 1)
-        window_sum = sum(counts[(start + i) % 24] for i in range(3))
-        if window_sum > best_sum:
-            best_sum = window_sum
-            best_start = start
-
-    if best_sum == 0:
+    if window_sums[best_start] == 0:
         return []
 
-    return [(best_start + i) % 24 for i in range(3)]
+    return [(best_start + i) % 24 for i in range(PEAK_WINDOW)]
 
 
-async def get_rival(username: str, hourly_pattern: list[HourlyActivity], period: str, user_id: str | None = None) -> RivalInfo | None:
+async def get_rival(username: str, hourly_pattern: list[HourlyActivity], period: str, user_id: str | None = None,
+                    top_users: list[dict] | None = None) -> RivalInfo | None:
     """Find user with most similar hourly activity pattern using cosine similarity"""
     date_filter = get_date_filter(period)
     match_stage = {**BOT_FILTER, **date_filter} if date_filter else BOT_FILTER
 
-    # Get hourly patterns for top users only (limited for performance)
-    pipeline = [
-        {"$match": match_stage},
-        {"$group": {
-            "_id": {"username": "$username", "hour": "$hour"},
-            "display_name": {"$last": "$display_name"},
-            "count": {"$sum": 1}
-        }},
-        {"$group": {
-            "_id": "$_id.username",
-            "display_name": {"$last": "$display_name"},
-            "hours": {"$push": {"hour": "$_id.hour", "count": "$count"}},
-            "total": {"$sum": "$count"}
-        }},
-        {"$sort": {"total": -1}},
-        {"$limit": MAX_USERS_QUERY}
-    ]
+    # When the caller already knows the top users, scope the per-hour group
+    # to them instead of re-ranking the whole collection
+    if top_users is not None:
+        match_stage = {**match_stage, "username": {"$in": [u["_id"] for u in top_users]}}
+
+    if period == "all" and _rollup_ready:
+        # All-time patterns come straight from the rollup (one doc per
+        # username/hour) instead of re-grouping every message
+        pipeline = []
+        if top_users is not None:
+            pipeline.append({"$match": {"username": {"$in": [u["_id"] for u in top_users]}}})
+        pipeline += [
+            {"$group": {
+                "_id": "$username",
+                "display_name": {"$last": "$display_name"},
+                "hours": {"$push": {"hour": "$hour", "count": "$count"}},
+                "total": {"$sum": "$count"}
+            }},
+            {"$sort": {"total": -1}},
+            {"$limit": MAX_USERS_QUERY}
+        ]
+        all_users = await db.user_hour_counts.aggregate(pipeline).to_list(MAX_USERS_QUERY)
+    else:
+        # Get hourly patterns for top users only (limited for performance)
+        pipeline = [
+            {"$match": match_stage},
+            {"$group": {
+                "_id": {"username": "$username", "hour": "$hour"},
+                "display_name": {"$last": "$display_name"},
+                "count": {"$sum": 1}
+            }},
+            {"$group": {
+                "_id": "$_id.username",
+                "display_name": {"$last": "$display_name"},
+                "hours": {"$push": {"hour": "$_id.hour", "count": "$count"}},
+                "total": {"$sum": "$count"}
+            }},
+            {"$sort": {"total": -1}},
+            {"$limit": MAX_USERS_QUERY}
+        ]
 
-    all_users = await db.messages.aggregate(pipeline).to_list(MAX_USERS_QUERY)
+        all_users = await db.messages.aggregate(pipeline).to_list(MAX_USERS_QUERY)
 
     if not all_users:
         return None
 
     # Build user's pattern vector
-    user_vector = [h.count for h in hourly_pattern]
-    user_magnitude = math.sqrt(sum(x * x for x in user_vector))
+    user_vector = np.fromiter((h.count for h in hourly_pattern), dtype=np.float64, count=24)
+    user_magnitude = float(np.linalg.norm(user_vector))
 
     if user_magnitude == 0:
         return None
 
-    best_rival = None
-    best_similarity = -1
-
-    for other_user in all_users:
-        if other_user["_id"] == username.lower():
-            continue
-
-        # Build other user's pattern vector
-        other_hours = {h["hour"]: h["count"] for h in other_user["hours"]}
-        other_vector = [other_hours.get(i, 0) for i in range(24)]
-        other_magnitude = math.sqrt(sum(x * x for x in other_vector))
-
-        if other_magnitude == 0:
-            continue
-
-        # Cosine similarity
-        dot_product = sum(a * b for a, b in zip(user_vector, other_vector))
-        similarity = (dot_product / (user_magnitude * other_magnitude)) * 100
+    username_lower = username.lower()
 
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_rival = RivalInfo(
-                username=other_user["_id"],
-                display_name=other_user["display_name"],
-                similarity_score=round(similarity, 1)
-            )
+    # One (N, 24) matrix holds every candidate's hourly pattern
+    matrix = np.zeros((len(all_users), 24), dtype=np.float64)
+    for i, other_user in enumerate(all_users):
+        for h in other_user["hours"]:
+            matrix[i, h["hour"]] = h["count"]
+
+    # Cosine similarity for all candidates in one matrix-vector product
+    magnitudes = np.linalg.norm(matrix, axis=1) * user_magnitude
+    similarities = np.full(len(all_users), -1.0)
+    valid = magnitudes > 0
+    similarities[valid] = (matrix @ user_vector)[valid] / magnitudes[valid] * 100
+
+    # Mask the user themselves
+    for i, other_user in enumerate(all_users):
+        if other_user["_id"] == username_lower:
+            similarities[i] = -1.0
+
+    best = int(similarities.argmax())
+    if similarities[best] < 0:
+        return None
 
-    return best_rival
+    return RivalInfo(
+        username=all_users[best]["_id"],
+        display_name=all_users[best]["display_name"],
+        similarity_score=round(float(similarities[best]), 1)
+    )
 
 
 async def get_top_replies(username: str, period: str, limit: int = 5, user_id: str | None = None) -> list[ReplyTarget]:
@@ -444,49 +665,128 @@ async def get_top_replies(username: str, period: str, limit: int = 5, user_id: s
     else:
         user_match = user_query
 
-    # Limit to recent messages for performance
-    user_messages = await db.messages.find(user_match).sort("timestamp", -1).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
+    excluded_usernames = list(IGNORED_BOTS) + [username.lower()]
 
-    if not user_messages:
-        return []
+    # Single server-side join: for each of the user's recent messages, pull the
+    # other users' messages in the 10s window before it. Replaces the previous
+    # one-find-per-message loop (up to MAX_MESSAGES_QUERY round-trips).
+    pipeline = [
+        {"$match": user_match},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": MAX_MESSAGES_QUERY},
+        {"$project": {"_id": 0, "timestamp": 1}},
+        {"$lookup": {
+            "from": "chat_messages",
+            "let": {"t": "$timestamp"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$not": [{"$in": ["$username", excluded_usernames]}]},
+                    # $subtract on a date takes milliseconds
+                    {"$gte": ["$timestamp", {"$subtract": ["$$t", 10000]}]},
+                    {"$lt": ["$timestamp", "$$t"]}
+                ]}}},
+                {"$limit": 50},
+                {"$project": {"_id": 0, "username": 1, "display_name": 1}}
+            ],
+            "as": "prev"
+        }},
+        {"$unwind": "$prev"},
+        {"$group": {
+            "_id": "$prev.username",
+            "display_name": {"$last": "$prev.display_name"},
+            "count": {"$sum": 1}
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]
 
-    reply_counts: dict[str, dict] = {}
+    try:
+        results = await db.messages.aggregate(pipeline).to_list(limit)
+    except Exception as e:
+        # Older servers may reject the correlated $lookup; fall back to a
+        # client-side sliding-window join
+        print(f"Top-replies $lookup failed, using scan fallback: {e}")
+        return await _get_top_replies_scan(user_match, username.lower(), limit)
+
+    return [
+        ReplyTarget(
+            username=entry["_id"],
+            display_name=entry.get("display_name") or entry["_id"],
+            reply_count=entry["count"]
+        )
+        for entry in results
+    ]
 
-    for msg in user_messages:
-        msg_time = msg["timestamp"]
-        # Find messages from other users in the 10 seconds before this message
-        window_start = msg_time - timedelta(seconds=10)
 
-        previous_messages = await db.messages.find({
-            "$and": [
-                BOT_FILTER,
-                {"username": {"$ne": username.lower()}},
-                {"timestamp": {"$gte": window_start, "$lt": msg_time}}
-            ]
-        }).limit(50).to_list(50)
+async def _get_top_replies_scan(user_match: dict, username_lower: str, limit: int) -> list[ReplyTarget]:
+    """Client-side fallback for get_top_replies.
+
+    Streams both sides sorted by timestamp once and joins them with a
+    two-pointer sliding window — O(N+M) instead of one window query per
+    user message.
+    """
+    user_docs = await db.messages.find(
+        user_match, projection={"_id": 0, "timestamp": 1}
+    ).sort("timestamp", -1).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
+
+    if not user_docs:
+        return []
+
+    user_times = sorted(doc["timestamp"] for doc in user_docs)
+    window = timedelta(seconds=10)
 
-        for prev_msg in previous_messages:
-            other_username = prev_msg["username"]
-            if other_username not in reply_counts:
+    reply_counts: dict[str, dict] = {}
+    recent: deque = deque()  # (timestamp, username, display_name) of other users
+
+    def close_out(target_ts):
+        """Credit every buffered message inside [target_ts - 10s, target_ts)"""
+        while recent and recent[0][0] < target_ts - window:
+            recent.popleft()
+        for _, other_username, display_name in recent:
+            entry = reply_counts.get(other_username)
+            if entry is None:
                 reply_counts[other_username] = {
-                    "display_name": prev_msg.get("display_name", other_username),
-                    "count": 0
+                    "display_name": display_name or other_username,
+                    "count": 1
                 }
-            reply_counts[other_username]["count"] += 1
+            else:
+                entry["count"] += 1
 
-    # Sort by count and take top N
-    sorted_replies = sorted(reply_counts.items(), key=lambda x: x[1]["count"], reverse=True)[:limit]
+    others_cursor = db.messages.find(
+        {
+            "$and": [
+                BOT_FILTER,
+                {"username": {"$ne": username_lower}},
+                {"timestamp": {"$gte": user_times[0] - window, "$lt": user_times[-1]}}
+            ]
+        },
+        projection={"_id": 0, "username": 1, "display_name": 1, "timestamp": 1}
+    ).sort("timestamp", 1)
+
+    i = 0
+    async for msg in others_cursor:
+        ts = msg["timestamp"]
+        while i < len(user_times) and user_times[i] <= ts:
+            close_out(user_times[i])
+            i += 1
+        recent.append((ts, msg["username"], msg.get("display_name")))
+    while i < len(user_times):
+        close_out(user_times[i])
+        i += 1
+
+    sorted_replies = heapq.nlargest(limit, reply_counts.items(), key=lambda x: x[1]["count"])
 
     return [
         ReplyTarget(
-            username=username,
+            username=other_username,
             display_name=data["display_name"],
             reply_count=data["count"]
         )
-        for username, data in sorted_replies
+        for other_username, data in sorted_replies
     ]
 
 
+@ttl_cache(600)
 async def get_rising_stars(limit: int = 10) -> list[RisingStarEntry]:
     """Users with biggest growth: last 7 days vs previous 7 days"""
     now = datetime.now(timezone.utc)
@@ -494,7 +794,10 @@ async def get_rising_stars(limit: int = 10) -> list[RisingStarEntry]:
     prev_week = now - timedelta(days=14)
 
     pipeline = [
-        {"$match": BOT_FILTER},
+        # The planner can't push filters through $facet, so restrict to the
+        # two-week window (indexed on timestamp) before fanning out; the
+        # branches keep their narrower bounds
+        {"$match": {**BOT_FILTER, "timestamp": {"$gte": prev_week}}},
         {"$facet": {
             "current": [
                 {"$match": {"timestamp": {"$gte": last_week}}},
@@ -541,9 +844,8 @@ async def get_rising_stars(limit: int = 10) -> list[RisingStarEntry]:
             "growth_percent": growth_percent
         })
 
-    # Sort by growth percentage (descending) and take top N
-    growth_data.sort(key=lambda x: x["growth_percent"], reverse=True)
-    top_growth = growth_data[:limit]
+    # Top N by growth percentage without sorting every user
+    top_growth = heapq.nlargest(limit, growth_data, key=lambda x: x["growth_percent"])
 
     return [
         RisingStarEntry(
@@ -558,8 +860,32 @@ async def get_rising_stars(limit: int = 10) -> list[RisingStarEntry]:
     ]
 
 
+@ttl_cache(300)
 async def get_hour_leaders() -> list[HourLeaderEntry]:
     """Top chatter for each of the 24 hours"""
+    if _rollup_ready:
+        # The rollup already holds one doc per (username, hour)
+        pipeline = [
+            {"$sort": {"count": -1}},
+            {"$group": {
+                "_id": "$hour",
+                "top_user": {"$first": "$username"},
+                "display_name": {"$first": "$display_name"},
+                "count": {"$first": "$count"}
+            }},
+            {"$sort": {"_id": 1}}
+        ]
+        results = await db.user_hour_counts.aggregate(pipeline).to_list(24)
+        return [
+            HourLeaderEntry(
+                hour=entry["_id"],
+                username=entry["top_user"],
+                display_name=entry["display_name"],
+                message_count=entry["count"]
+            )
+            for entry in results
+        ]
+
     pipeline = [
         {"$match": BOT_FILTER},
         {"$group": {
@@ -590,6 +916,7 @@ async def get_hour_leaders() -> list[HourLeaderEntry]:
     ]
 
 
+@ttl_cache(600)
 async def get_top_writers(limit: int = 10) -> list[WriterEntry]:
     """Users with longest average message length (min 10 messages)"""
     pipeline = [
@@ -619,6 +946,7 @@ async def get_top_writers(limit: int = 10) -> list[WriterEntry]:
     ]
 
 
+@ttl_cache(15)
 async def get_active_chatters(min_messages: int = 5, minutes: int = 5) -> tuple[list[ActiveChatter], int]:
     """Get users who sent more than min_messages in the last N minutes"""
     now = datetime.now(timezone.utc)
@@ -635,8 +963,6 @@ async def get_active_chatters(min_messages: int = 5, minutes: int = 5) -> tuple[
         {"$sort": {"count": -1}}
     ]
 
-    results = await db.messages.aggregate(pipeline).to_list(None)
-
     # Get overall leaderboard ranks for active chatters
     rank_pipeline = [
         {"$match": BOT_FILTER},
@@ -650,22 +976,27 @@ async def get_active_chatters(min_messages: int = 5, minutes: int = 5) -> tuple[
     # Build rank lookup
     rank_map = {user["_id"]: i + 1 for i, user in enumerate(all_users)}
 
-    chatters = [
-        ActiveChatter(
+    # The active-chatter result set is unbounded; stream it into the final
+    # models instead of buffering raw docs with to_list(None)
+    chatters = []
+    async for entry in db.messages.aggregate(pipeline):
+        chatters.append(ActiveChatter(
             username=entry["_id"],
             display_name=entry["display_name"],
             message_count=entry["count"],
             rank=rank_map.get(entry["_id"])
-        )
-        for entry in results
-    ]
+        ))
     return chatters, total_users
 
 
 async def get_user_comparison(user1: str, user2: str, period: str = "all") -> tuple[UserStats | None, UserStats | None]:
     """Get stats for two users for comparison"""
-    stats1 = await get_user_stats(user1, period)
-    stats2 = await get_user_stats(user2, period)
+    # Each side fans out its own queries internally; running both sides
+    # concurrently halves the endpoint's wall time
+    stats1, stats2 = await asyncio.gather(
+        get_user_stats(user1, period),
+        get_user_stats(user2, period),
+    )
     return stats1, stats2
 
 
@@ -674,11 +1005,13 @@ async def search_users(query: str, limit: int = 10) -> list[UserSearchResult]:
     if not query or len(query) < 2:
         return []
 
-    # Escape special regex characters and create case-insensitive prefix match
+    # Escape special regex characters; usernames are stored lowercase, so an
+    # anchored case-sensitive prefix regex stays an index range scan (the
+    # previous "i" option forced a full index sweep)
     escaped_query = re.escape(query.lower())
 
     pipeline = [
-        {"$match": {"$and": [BOT_FILTER, {"username": {"$regex": f"^{escaped_query}", "$options": "i"}}]}},
+        {"$match": {"$and": [BOT_FILTER, {"username": {"$regex": f"^{escaped_query}"}}]}},
         {"$group": {
             "_id": "$username",
             "display_name": {"$last": "$display_name"},
@@ -700,20 +1033,14 @@ async def search_users(query: str, limit: int = 10) -> list[UserSearchResult]:
     ]
 
 
-async def get_user_rankings(username: str, period: str, user_id: str | None = None) -> UserRankings:
+async def get_user_rankings(username: str, period: str, user_id: str | None = None,
+                            top_users: list[dict] | None = None) -> UserRankings:
     """Get user's position in various leaderboards"""
-    date_filter = get_date_filter(period)
-    match_stage = {**BOT_FILTER, **date_filter} if date_filter else BOT_FILTER
     username_lower = username.lower()
 
-    # Get top rank (position in message count leaderboard, limited)
-    top_pipeline = [
-        {"$match": match_stage},
-        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": MAX_USERS_QUERY}
-    ]
-    all_users = await db.messages.aggregate(top_pipeline).to_list(MAX_USERS_QUERY)
+    # Top rank (position in message count leaderboard, limited); reuse the
+    # caller's copy when it already ran the shared aggregation
+    all_users = top_users if top_users is not None else await get_top_user_counts(period)
 
     top_rank = None
     for i, user in enumerate(all_users):
@@ -721,22 +1048,44 @@ async def get_user_rankings(username: str, period: str, user_id: str | None = No
             top_rank = i + 1
             break
 
-    # Get rank change vs last week
+    now = datetime.now(timezone.utc)
+    last_week = now - timedelta(days=7)
+    prev_week = now - timedelta(days=14)
+
+    # Last week's ranking (only needed when the user ranks at all)
+    prev_pipeline = [
+        {"$match": {**BOT_FILTER, "timestamp": {"$gte": prev_week, "$lt": last_week}}},
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": MAX_USERS_QUERY}
+    ]
+
+    writers_pipeline = [
+        {"$match": BOT_FILTER},
+        {"$group": {
+            "_id": "$username",
+            "avg_length": {"$avg": {"$strLenCP": "$message"}},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gte": 10}}},
+        {"$sort": {"avg_length": -1}},
+        {"$limit": MAX_USERS_QUERY}
+    ]
+
+    async def _empty():
+        return []
+
+    # The four remaining lookups are independent; overlap their round-trips
+    prev_users, writers, rising_entries, hour_leaders = await asyncio.gather(
+        db.messages.aggregate(prev_pipeline).to_list(MAX_USERS_QUERY) if top_rank is not None else _empty(),
+        db.messages.aggregate(writers_pipeline).to_list(MAX_USERS_QUERY),
+        get_rising_stars(limit=100),
+        get_hour_leaders(),
+    )
+
+    # Rank change vs last week
     top_rank_change = None
     if top_rank is not None:
-        now = datetime.now(timezone.utc)
-        last_week = now - timedelta(days=7)
-        prev_week = now - timedelta(days=14)
-
-        # Get rank from last week
-        prev_pipeline = [
-            {"$match": {**BOT_FILTER, "timestamp": {"$gte": prev_week, "$lt": last_week}}},
-            {"$group": {"_id": "$username", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": MAX_USERS_QUERY}
-        ]
-        prev_users = await db.messages.aggregate(prev_pipeline).to_list(MAX_USERS_QUERY)
-
         prev_rank = None
         for i, user in enumerate(prev_users):
             if user["_id"] == username_lower:
@@ -746,36 +1095,21 @@ async def get_user_rankings(username: str, period: str, user_id: str | None = No
         if prev_rank is not None:
             top_rank_change = prev_rank - top_rank  # Positive = improved
 
-    # Get rising stars rank
-    rising_entries = await get_rising_stars(limit=100)
+    # Rising stars rank
     rising_rank = None
     for entry in rising_entries:
         if entry.username == username_lower:
             rising_rank = entry.rank
             break
 
-    # Get writers rank
-    writers_pipeline = [
-        {"$match": BOT_FILTER},
-        {"$group": {
-            "_id": "$username",
-            "avg_length": {"$avg": {"$strLenCP": "$message"}},
-            "count": {"$sum": 1}
-        }},
-        {"$match": {"count": {"$gte": 10}}},
-        {"$sort": {"avg_length": -1}},
-        {"$limit": MAX_USERS_QUERY}
-    ]
-    writers = await db.messages.aggregate(writers_pipeline).to_list(MAX_USERS_QUERY)
-
+    # Writers rank
     writers_rank = None
     for i, user in enumerate(writers):
         if user["_id"] == username_lower:
             writers_rank = i + 1
             break
 
-    # Get hours dominated
-    hour_leaders = await get_hour_leaders()
+    # Hours dominated
     hours_dominated = [entry.hour for entry in hour_leaders if entry.username == username_lower]
 
     return UserRankings(
@@ -798,26 +1132,10 @@ async def get_chat_activity_today() -> tuple[list[ChatActivityPoint], int, int,
         {"$sort": {"_id": 1}}
     ]
 
-    results = await db.messages.aggregate(pipeline).to_list(24)
-
-    hourly_map = {r["_id"]: r["count"] for r in results}
-    activity = [
-        ChatActivityPoint(hour=h, count=hourly_map.get(h, 0))
-        for h in range(24)
-    ]
-
-    total_today = sum(a.count for a in activity)
-
-    peak_hour = 0
-    peak_count = 0
-    for a in activity:
-        if a.count > peak_count:
-            peak_count = a.count
-            peak_hour = a.hour
-
-    return activity, total_today, peak_hour, peak_count
+    return await _build_hourly(db.messages.aggregate(pipeline))
 
 
+@ttl_cache(600)
 async def get_overall_hourly_activity() -> tuple[list[ChatActivityPoint], int, int, int]:
     """Get overall chat activity by hour (all time)"""
     pipeline = [
@@ -826,24 +1144,36 @@ async def get_overall_hourly_activity() -> tuple[list[ChatActivityPoint], int, i
         {"$sort": {"_id": 1}}
     ]
 
-    results = await db.messages.aggregate(pipeline).to_list(24)
+    return await _build_hourly(db.messages.aggregate(pipeline))
 
-    hourly_map = {r["_id"]: r["count"] for r in results}
-    activity = [
-        ChatActivityPoint(hour=h, count=hourly_map.get(h, 0))
-        for h in range(24)
-    ]
 
-    total_messages = sum(a.count for a in activity)
+async def _count_emotes_server_side(match_query: dict, limit: int) -> list[EmoteUsage]:
+    """Tokenize messages and count emotes inside MongoDB.
+
+    Only (emote, count) pairs cross the wire instead of up to
+    MAX_MESSAGES_QUERY full message bodies.
+    """
+    emotes = await get_7tv_emotes()
+    if not emotes:
+        return []
 
-    peak_hour = 0
-    peak_count = 0
-    for a in activity:
-        if a.count > peak_count:
-            peak_count = a.count
-            peak_hour = a.hour
+    pipeline = [
+        {"$match": match_query},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": MAX_MESSAGES_QUERY},
+        {"$project": {"words": {"$split": ["$message", " "]}}},
+        {"$unwind": "$words"},
+        {"$match": {"words": {"$in": list(emotes.keys())}}},
+        {"$group": {"_id": "$words", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit}
+    ]
+    results = await db.messages.aggregate(pipeline).to_list(limit)
 
-    return activity, total_messages, peak_hour, peak_count
+    return [
+        EmoteUsage(emote_name=entry["_id"], emote_id=emotes[entry["_id"]], count=entry["count"])
+        for entry in results
+    ]
 
 
 async def get_user_top_emotes(username: str, limit: int = 5, user_id: str | None = None) -> list[EmoteUsage]:
@@ -858,7 +1188,14 @@ async def get_user_top_emotes(username: str, limit: int = 5, user_id: str | None
     else:
         match_query = {**user_query, **date_filter}
 
-    messages = await db.messages.find(match_query).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
+    try:
+        return await _count_emotes_server_side(match_query, limit)
+    except Exception as e:
+        print(f"Server-side emote count failed, counting in Python: {e}")
+
+    messages = await db.messages.find(
+        match_query, projection={"_id": 0, "message": 1}
+    ).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
 
     message_texts = [msg["message"] for msg in messages]
     return await count_emotes_in_messages(message_texts, limit)
@@ -869,11 +1206,19 @@ async def get_chat_top_emotes(limit: int = 5) -> tuple[list[EmoteUsage], int]:
     now = datetime.now(timezone.utc)
     thirty_days_ago = now - timedelta(days=30)
 
+    match_query = {**BOT_FILTER, "timestamp": {"$gte": thirty_days_ago}}
+
+    try:
+        emotes = await _count_emotes_server_side(match_query, limit)
+        total = sum(e.count for e in emotes)
+        return emotes, total
+    except Exception as e:
+        print(f"Server-side emote count failed, counting in Python: {e}")
+
     # Sample messages for performance (get most recent ones)
-    messages = await db.messages.find({
-        **BOT_FILTER,
-        "timestamp": {"$gte": thirty_days_ago}
-    }).sort("timestamp", -1).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
+    messages = await db.messages.find(
+        match_query, projection={"_id": 0, "message": 1}
+    ).sort("timestamp", -1).limit(MAX_MESSAGES_QUERY).to_list(MAX_MESSAGES_QUERY)
 
     message_texts = [msg["message"] for msg in messages]
     emotes = await count_emotes_in_messages(message_texts, limit)
@@ -899,21 +1244,4 @@ async def get_unique_chatters_by_hour() -> tuple[list[ChatActivityPoint], int, i
         {"$sort": {"_id": 1}}
     ]
 
-    results = await db.messages.aggregate(pipeline).to_list(24)
-
-    hourly_map = {r["_id"]: r["count"] for r in results}
-    activity = [
-        ChatActivityPoint(hour=h, count=hourly_map.get(h, 0))
-        for h in range(24)
-    ]
-
-    total_unique = sum(a.count for a in activity)
-
-    peak_hour = 0
-    peak_count = 0
-    for a in activity:
-        if a.count > peak_count:
-            peak_count = a.count
-            peak_hour = a.hour
-
-    return activity, total_unique, peak_hour, peak_count
+    return await _build_hourly(db.messages.aggregate(pipeline))
@@ -3,7 +3,15 @@
 
 import asyncio
 import sys
-from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+# libuv-backed event loop when available; the stdlib selector loop works too
+try:
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
 
 # Add backend to path
 sys.path.insert(0, '/home/clawdbot/twitch-stats/backend')
@@ -13,126 +21,221 @@ RED = '\033[0;31m'
 YELLOW = '\033[1;33m'
 NC = '\033[0m'
 
-passed = 0
-failed = 0
+# Indexes _create_indexes is expected to have built on chat_messages
+_EXPECTED_INDEXES = frozenset({
+    'username_1_timestamp_-1',
+    'timestamp_-1',
+    'username_1_hour_1',
+    'user_id_1_timestamp_-1',
+    'user_id_1_hour_1',
+})
+
+@dataclass
+class Results:
+    passed: int = 0
+    failed: int = 0
+    # Output is buffered per test block and written in one syscall, rather
+    # than one flushing print() per assertion
+    lines: list = field(default_factory=list)
 
 
-def test_pass(msg):
-    global passed
-    print(f"{GREEN}PASS{NC} {msg}")
-    passed += 1
+def test_pass(r, msg):
+    r.lines.append(f"{GREEN}PASS{NC} {msg}")
+    r.passed += 1
 
 
-def test_fail(msg, error=None):
-    global failed
-    print(f"{RED}FAIL{NC} {msg}")
+def test_fail(r, msg, error=None):
+    r.lines.append(f"{RED}FAIL{NC} {msg}")
     if error:
-        print(f"      Error: {error}")
-    failed += 1
+        r.lines.append(f"      Error: {error}")
+    r.failed += 1
+
+
+def flush_output(r):
+    if r.lines:
+        sys.stdout.write('\n'.join(r.lines) + '\n')
+        sys.stdout.flush()
+        r.lines.clear()
+
+
+# Import the backend modules at module scope so Tests 1/2 time the actual
+# config/connection work, not importlib's first-load cost
+try:
+    from app.config import get_settings
+    from app.database import db
+except ImportError as e:
+    _r = Results()
+    test_fail(_r, "Backend import", e)
+    flush_output(_r)
+    sys.exit(1)
+
+
+async def get_cached_index_names(db):
+    """Index names for chat_messages, cached on the db manager.
+
+    The test only compares names, so collect those straight off the
+    list_indexes cursor instead of decoding the full spec dict that
+    index_information builds. listIndexes costs a round-trip; caching per
+    process lets other scripts reuse the result when these run as a suite.
+    """
+    cache = getattr(db, '_idx_cache', None)
+    if cache is None:
+        cache = db._idx_cache = {}
+    if 'chat_messages' not in cache:
+        cache['chat_messages'] = {d['name'] async for d in db.messages.list_indexes()}
+    return cache['chat_messages']
+
+
+async def get_collection_stats(db):
+    """Storage-engine metadata for chat_messages: count plus size in one
+    constant-time command. Falls back to the estimated count if collStats
+    isn't permitted on this deployment."""
+    try:
+        return await db.db.command('collStats', 'chat_messages')
+    except Exception:
+        return {'count': await db.messages.estimated_document_count()}
 
 
 async def main():
+    r = Results()
     print("================================")
     print("Database Tests")
     print("================================")
     print("")
 
-    # Test 1: Import config
+    # Test 1: Load config
     try:
-        from app.config import get_settings
         settings = get_settings()
-        test_pass(f"Config loaded (MongoDB: {settings.mongodb_url[:30]}...)")
+        test_pass(r, f"Config loaded (MongoDB: {settings.mongodb_url[:30]}...)")
     except Exception as e:
-        test_fail("Config import", e)
+        test_fail(r, "Config load", e)
+        flush_output(r)
         return 1
+    flush_output(r)
 
     # Test 2: Database connection
     try:
-        from app.database import db
         await db.connect()
-        test_pass("Database connected")
+        test_pass(r, "Database connected")
     except Exception as e:
-        test_fail("Database connection", e)
+        test_fail(r, "Database connection", e)
+        flush_output(r)
         return 1
+    flush_output(r)
 
-    # Test 3: Messages collection exists
+    # Warm the pool before dispatching the concurrent tests, so none of them
+    # pays TCP/TLS/auth handshake latency inside its own timing
+    await db.db.command('ping')
+
+    # Test 3: Messages collection exists. Runs before the gather: it is a
+    # constant-time metadata read, and its count decides whether the
+    # aggregation test is dispatched at all
+    msg_count = 0
     try:
-        count = await db.messages.count_documents({})
-        test_pass(f"Messages collection accessible ({count:,} documents)")
+        stats = await get_collection_stats(db)
     except Exception as e:
-        test_fail("Messages collection", e)
+        test_fail(r, "Messages collection", e)
+    else:
+        msg_count = stats['count']
+        if 'size' in stats:
+            test_pass(r, f"Messages collection accessible ({msg_count:,} documents, {stats['size']:,} bytes)")
+        else:
+            test_pass(r, f"Messages collection accessible ({msg_count:,} documents)")
+
+    flush_output(r)
+
+    # Tests 4-6 are independent and I/O-bound; dispatch them together so the
+    # script waits for the slowest round-trip instead of the sum of all three
+    # $group alone can't use an index; restricting the scan to the last week
+    # via the timestamp index keeps the smoke test cheap on big collections
+    last_week = datetime.now(timezone.utc) - timedelta(days=7)
+    agg_pipeline = [
+        {"$match": {"timestamp": {"$gte": last_week}}},
+        {"$group": {"_id": "$username", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": 1}
+    ]
+    coros = [
+        get_cached_index_names(db),
+        # Only the fields Test 5 actually inspects; the full document drags
+        # the whole message body across the wire for nothing
+        db.messages.find_one({}, projection={
+            'username': 1, 'message': 1, 'timestamp': 1, 'hour': 1, 'user_id': 1, '_id': 0
+        }),
+    ]
+    if msg_count > 0:
+        # batchSize sizes the single reply for the $limit:1 result;
+        # allowDiskUse=False fails fast if the planner would spill
+        coros.append(db.messages.aggregate(agg_pipeline, batchSize=1, allowDiskUse=False).to_list(1))
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    indexes, sample = results[0], results[1]
+    agg_result = results[2] if msg_count > 0 else None
 
     # Test 4: Indexes exist
-    try:
-        indexes = await db.messages.index_information()
-        expected = [
-            'username_1_timestamp_-1',
-            'timestamp_-1',
-            'username_1_hour_1',
-            'user_id_1_timestamp_-1',
-            'user_id_1_hour_1'
-        ]
-        for idx in expected:
-            if idx in indexes:
-                test_pass(f"Index exists: {idx}")
-            else:
-                test_fail(f"Index missing: {idx}")
-    except Exception as e:
-        test_fail("Index check", e)
+    if isinstance(indexes, Exception):
+        test_fail(r, "Index check", indexes)
+    else:
+        missing = _EXPECTED_INDEXES - indexes
+        for idx in sorted(_EXPECTED_INDEXES - missing):
+            test_pass(r, f"Index exists: {idx}")
+        for idx in sorted(missing):
+            test_fail(r, f"Index missing: {idx}")
+
+    flush_output(r)
 
     # Test 5: Sample message structure
-    try:
-        sample = await db.messages.find_one()
+    if isinstance(sample, Exception):
+        test_fail(r, "Sample message", sample)
+    else:
         if sample:
             required_fields = ['username', 'message', 'timestamp', 'hour']
-            for field in required_fields:
-                if field in sample:
-                    test_pass(f"Message has field: {field}")
+            for field_name in required_fields:
+                if field_name in sample:
+                    test_pass(r, f"Message has field: {field_name}")
                 else:
-                    test_fail(f"Message missing field: {field}")
+                    test_fail(r, f"Message missing field: {field_name}")
 
             # Check for user_id (new field - may not exist in old messages)
             if 'user_id' in sample:
-                test_pass(f"Message has user_id: {sample['user_id']}")
+                test_pass(r, f"Message has user_id: {sample['user_id']}")
             else:
-                print(f"{YELLOW}INFO{NC} Old message without user_id (expected for legacy data)")
+                r.lines.append(f"{YELLOW}INFO{NC} Old message without user_id (expected for legacy data)")
 
-            # Check timestamp is datetime
-            if isinstance(sample.get('timestamp'), datetime):
+            # Check timestamp is datetime (presence was asserted above;
+            # exact type compare is all the fallback path needs)
+            if 'timestamp' in sample:
                 ts = sample['timestamp']
-                tz_info = "with timezone" if ts.tzinfo else "naive (no timezone)"
-                test_pass(f"Timestamp is datetime ({tz_info})")
-            else:
-                test_fail("Timestamp is not datetime type")
+                if type(ts) is datetime:
+                    tz_info = "with timezone" if ts.tzinfo is not None else "naive (no timezone)"
+                    test_pass(r, f"Timestamp is datetime ({tz_info})")
+                else:
+                    test_fail(r, "Timestamp is not datetime type")
         else:
-            print(f"{YELLOW}SKIP{NC} No messages in database")
-    except Exception as e:
-        test_fail("Sample message", e)
+            r.lines.append(f"{YELLOW}SKIP{NC} No messages in database")
+
+    flush_output(r)
 
     # Test 6: Aggregation works
-    try:
-        pipeline = [
-            {"$group": {"_id": "$username", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 1}
-        ]
-        result = await db.messages.aggregate(pipeline).to_list(1)
-        if result:
-            test_pass(f"Aggregation works (top user: {result[0]['_id']} with {result[0]['count']} msgs)")
-        else:
-            print(f"{YELLOW}SKIP{NC} No aggregation results")
-    except Exception as e:
-        test_fail("Aggregation", e)
+    if msg_count == 0:
+        r.lines.append(f"{YELLOW}SKIP{NC} No messages — skipping aggregation")
+    elif isinstance(agg_result, Exception):
+        test_fail(r, "Aggregation", agg_result)
+    elif agg_result:
+        test_pass(r, f"Aggregation works (top user last 7d: {agg_result[0]['_id']} with {agg_result[0]['count']} msgs)")
+    else:
+        r.lines.append(f"{YELLOW}SKIP{NC} No aggregation results")
+
+    flush_output(r)
 
     # Cleanup
     await db.disconnect()
 
     print("")
     print("================================")
-    print(f"Results: {GREEN}{passed} passed{NC}, {RED}{failed} failed{NC}")
+    print(f"Results: {GREEN}{r.passed} passed{NC}, {RED}{r.failed} failed{NC}")
     print("================================")
 
-    return failed
+    return r.failed
 
 
 if __name__ == "__main__":